@@ -1,21 +1,33 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from functools import partial
 from sqlalchemy.orm import Session
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue, IssueSeverity
-from app.database.models import NCCIEdit
+from app.agents import reference_cache
+
+_issue = partial(ValidationIssue.from_agent, "Bundling Validator")
 
 
 class BundlingValidator:
     """Validates bundling/unbundling violations"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, ncci_map: Optional[Dict[Tuple[str, str], str]] = None):
         self.db = db
+        # NCCI edits between the claim's codes, prefetched by the orchestrator
+        self.ncci_map = ncci_map
+        self._ncci_map: Dict[Tuple[str, str], str] = {}
         # Common bundling rules (simplified NCCI edits)
         self.bundled_pairs = {
             ('43235', '43239'): 'Upper GI endoscopy procedures are bundled',
             ('45378', '45380'): 'Colonoscopy with biopsy includes diagnostic colonoscopy',
             ('45380', '45385'): 'Colonoscopy with polyp removal includes biopsy',
         }
+        self._bundled_codes = frozenset(c for pair in self.bundled_pairs for c in pair)
+
+        # Directional index: first code -> {second code: explanation}
+        self.bundled_index: Dict[str, Dict[str, str]] = {}
+        for (code1, code2), explanation in self.bundled_pairs.items():
+            self.bundled_index.setdefault(code1, {})[code2] = explanation
 
     def validate(self, claim: Claim) -> List[ValidationIssue]:
         """Run bundling validation checks"""
@@ -36,24 +48,38 @@ class BundlingValidator:
         """Check if procedures are improperly unbundled"""
         issues = []
 
-        codes = [p.cpt for p in claim.procedure_codes]
+        procs = claim.procedure_codes
+        codes = [p.cpt for p in procs]
+        self._ncci_map = self.ncci_map
+        if self._ncci_map is None:
+            self._ncci_map = self._load_ncci_edits(codes)
+
+        # Hardcoded rules only apply if some code on the claim appears in them
+        check_hardcoded = not self._bundled_codes.isdisjoint(codes)
+        if not self._ncci_map and not check_hardcoded:
+            return issues
+
+        # Codes that are column 1 of at least one NCCI edit on this claim
+        ncci_column1 = {column1_code for column1_code, _ in self._ncci_map}
 
         # Check against NCCI database
-        for i, proc1 in enumerate(claim.procedure_codes):
-            for proc2 in claim.procedure_codes[i+1:]:
+        for i, proc1 in enumerate(procs):
+            bundled_with = self.bundled_index.get(proc1.cpt) if check_hardcoded else None
+
+            # Nothing can be bundled into proc1, skip its pairs entirely
+            if not bundled_with and proc1.cpt not in ncci_column1:
+                continue
+
+            for proc2 in procs[i+1:]:
                 # Check database first
-                ncci_edit = self.db.query(NCCIEdit).filter(
-                    NCCIEdit.column1_code == proc1.cpt,
-                    NCCIEdit.column2_code == proc2.cpt
-                ).first()
+                modifier_indicator = self._ncci_map.get((proc1.cpt, proc2.cpt))
 
-                if ncci_edit:
+                if modifier_indicator is not None:
                     # Check if modifier allows override
-                    has_override = self._check_modifier_override(proc2.modifiers, ncci_edit.modifier_indicator)
+                    has_override = self._check_modifier_override(proc2.modifiers, modifier_indicator)
 
                     if not has_override:
-                        issues.append(ValidationIssue(
-                            agent_name="Bundling Validator",
+                        issues.append(_issue(
                             issue_type="unbundling_violation",
                             severity=IssueSeverity.HIGH,
                             description=f"CPT {proc2.cpt} is bundled into {proc1.cpt}",
@@ -64,15 +90,16 @@ class BundlingValidator:
                         ))
 
                 # Check hardcoded rules
-                pair = (proc1.cpt, proc2.cpt)
-                if pair in self.bundled_pairs:
+                if not bundled_with:
+                    continue
+                explanation = bundled_with.get(proc2.cpt)
+                if explanation is not None:
                     if not self._has_distinct_modifier(proc2.modifiers):
-                        issues.append(ValidationIssue(
-                            agent_name="Bundling Validator",
+                        issues.append(_issue(
                             issue_type="unbundling_violation",
                             severity=IssueSeverity.HIGH,
                             description=f"CPT {proc2.cpt} bundled into {proc1.cpt}",
-                            explanation=self.bundled_pairs[pair],
+                            explanation=explanation,
                             confidence_score=0.85,
                             cost_impact=proc2.charge,
                             suggested_fix=f"Remove {proc2.cpt} or add modifier 59/X{'{EPSU}'} if distinct service"
@@ -80,12 +107,17 @@ class BundlingValidator:
 
         return issues
 
+    def _load_ncci_edits(self, codes: List[str]) -> Dict[Tuple[str, str], str]:
+        """Fetch all NCCI edits between the claim's codes in a single query"""
+        return reference_cache.get_ncci_edits(self.db, codes)
+
     def _check_em_procedure_bundling(self, claim: Claim) -> List[ValidationIssue]:
         """Check E/M with procedure on same day"""
         issues = []
 
-        em_codes = [p for p in claim.procedure_codes if p.cpt.startswith('99')]
-        procedures = [p for p in claim.procedure_codes if not p.cpt.startswith('99')]
+        procs = claim.procedure_codes
+        em_codes = [p for p in procs if p.cpt.startswith('99')]
+        procedures = [p for p in procs if not p.cpt.startswith('99')]
 
         if em_codes and procedures:
             for em in em_codes:
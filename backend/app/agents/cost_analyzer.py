@@ -1,92 +1,115 @@
-from typing import List
+from typing import Dict, List, Optional
+from functools import partial
+import numpy as np
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue, IssueSeverity
-from app.database.models import CPTCode, ICD10Code
+from app.agents import reference_cache
+
+_issue = partial(ValidationIssue.from_agent, "Cost Analyzer")
+
+# Routine (preventive) diagnosis codes
+ROUTINE_DIAGNOSES = frozenset({'Z00.00', 'Z00.01', 'Z00.121', 'Z00.129'})
+
+# High complexity E/M codes -> (expected routine code, expected charge)
+HIGH_EM_CODES = {
+    '99205': ('99203', 135),
+    '99215': ('99213', 135),
+    '99285': ('99283', 250),
+    '99223': ('99221', 150),
+}
 
 
 class CostAnalyzer:
     """Detects statistical outliers in billing amounts"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cpt_cache: Optional[Dict[str, Row]] = None):
         self.db = db
+        self.cpt_cache = cpt_cache  # CPT rows prefetched by the orchestrator
+        self._cpt_cache: Dict[str, Row] = {}
 
     def validate(self, claim: Claim) -> List[ValidationIssue]:
         """Run cost analysis checks"""
         issues = []
 
+        procs = claim.procedure_codes
+
+        # Reference data for every CPT code on the claim (cached across claims)
+        if self.cpt_cache is not None:
+            self._cpt_cache = self.cpt_cache
+        else:
+            self._cpt_cache = reference_cache.get_cpt_codes(self.db, [p.cpt for p in procs])
+
+        # Average charge per procedure (0.0 when unknown), shared by both checks
+        avg_charges = [self._get_avg_charge(p.cpt) for p in procs]
+
         # Check each procedure for cost anomalies
-        for proc in claim.procedure_codes:
-            issues.extend(self._check_charge_variance(claim, proc))
+        issues.extend(self._check_charge_variance(claim, procs, avg_charges))
 
         # Check for upcoding patterns
-        issues.extend(self._check_upcoding_patterns(claim))
+        issues.extend(self._check_upcoding_patterns(claim, avg_charges))
 
         return issues
 
-    def _check_charge_variance(self, claim: Claim, proc) -> List[ValidationIssue]:
-        """Check if charge deviates significantly from average"""
+    def _check_charge_variance(self, claim: Claim, procs, avg_charges: List[float]) -> List[ValidationIssue]:
+        """Check if charges deviate significantly from average (vectorized over procedures)"""
         issues = []
 
-        cpt = self.db.query(CPTCode).filter(CPTCode.code == proc.cpt).first()
-
-        if not cpt or not cpt.avg_charge:
+        # Only procedures with a known average charge can be compared
+        priced = [(p, avg) for p, avg in zip(procs, avg_charges) if avg]
+        if not priced:
             return issues
 
-        variance = (proc.charge - cpt.avg_charge) / cpt.avg_charge
+        charges = np.array([p.charge for p, _ in priced], dtype=np.float64)
+        avgs = np.array([avg for _, avg in priced], dtype=np.float64)
+        variances = (charges - avgs) / avgs
 
         # Flag if > 50% deviation
-        if abs(variance) > 0.50:
+        for idx in np.flatnonzero(np.abs(variances) > 0.50):
+            proc = priced[idx][0]
+            avg_charge = float(avgs[idx])
+            variance = float(variances[idx])
+
             if variance > 0:  # Overcharge
                 severity = IssueSeverity.HIGH if variance > 1.0 else IssueSeverity.MEDIUM
 
-                issues.append(ValidationIssue(
-                    agent_name="Cost Analyzer",
+                issues.append(_issue(
                     issue_type="unusual_charge_high",
                     severity=severity,
-                    description=f"CPT {proc.cpt} charge ${proc.charge:.2f} is {variance*100:.0f}% above average ${cpt.avg_charge:.2f}",
+                    description=f"CPT {proc.cpt} charge ${proc.charge:.2f} is {variance*100:.0f}% above average ${avg_charge:.2f}",
                     explanation=f"Charge deviates significantly from typical amount. Review documentation to justify higher charge.",
                     confidence_score=0.75,
-                    cost_impact=proc.charge - cpt.avg_charge,
-                    suggested_fix=f"Verify charge is correct. Expected range: ${cpt.avg_charge*0.8:.2f}-${cpt.avg_charge*1.2:.2f}"
+                    cost_impact=proc.charge - avg_charge,
+                    suggested_fix=f"Verify charge is correct. Expected range: ${avg_charge*0.8:.2f}-${avg_charge*1.2:.2f}"
                 ))
             else:  # Undercharge (less critical)
                 if variance < -0.80:  # Only flag if very low
-                    issues.append(ValidationIssue(
-                        agent_name="Cost Analyzer",
+                    issues.append(_issue(
                         issue_type="unusual_charge_low",
                         severity=IssueSeverity.LOW,
-                        description=f"CPT {proc.cpt} charge ${proc.charge:.2f} is {abs(variance)*100:.0f}% below average ${cpt.avg_charge:.2f}",
+                        description=f"CPT {proc.cpt} charge ${proc.charge:.2f} is {abs(variance)*100:.0f}% below average ${avg_charge:.2f}",
                         explanation="Charge is unusually low. May indicate billing error or contract discount.",
                         confidence_score=0.60
                     ))
 
         return issues
 
-    def _check_upcoding_patterns(self, claim: Claim) -> List[ValidationIssue]:
+    def _check_upcoding_patterns(self, claim: Claim, avg_charges: List[float]) -> List[ValidationIssue]:
         """Detect potential upcoding patterns"""
         issues = []
+        procs = claim.procedure_codes
 
         # Pattern 1: High complexity E/M with routine diagnosis
-        routine_diagnoses = ['Z00.00', 'Z00.01', 'Z00.121', 'Z00.129']
-        has_routine = any(dx in routine_diagnoses for dx in claim.diagnosis_codes)
+        has_routine = not ROUTINE_DIAGNOSES.isdisjoint(claim.diagnosis_codes)
 
         if has_routine:
-            for proc in claim.procedure_codes:
-                # High complexity E/M codes
-                high_em_codes = {
-                    '99205': ('99203', 135),
-                    '99215': ('99213', 135),
-                    '99285': ('99283', 250),
-                    '99223': ('99221', 150),
-                }
-
-                if proc.cpt in high_em_codes:
-                    expected_code, expected_charge = high_em_codes[proc.cpt]
+            for proc in procs:
+                if proc.cpt in HIGH_EM_CODES:
+                    expected_code, expected_charge = HIGH_EM_CODES[proc.cpt]
                     cost_diff = proc.charge - expected_charge
 
-                    issues.append(ValidationIssue(
-                        agent_name="Cost Analyzer",
+                    issues.append(_issue(
                         issue_type="potential_upcoding",
                         severity=IssueSeverity.HIGH,
                         description=f"Possible upcoding: {proc.cpt} billed for routine visit",
@@ -97,27 +120,23 @@ class CostAnalyzer:
                     ))
 
         # Pattern 2: Unusually high number of procedures
-        if len(claim.procedure_codes) > 5:
-            issues.append(ValidationIssue(
-                agent_name="Cost Analyzer",
+        if len(procs) > 5:
+            issues.append(_issue(
                 issue_type="high_procedure_count",
                 severity=IssueSeverity.LOW,
-                description=f"Claim has {len(claim.procedure_codes)} procedures",
+                description=f"Claim has {len(procs)} procedures",
                 explanation="Unusually high number of procedures on single claim. Verify all are documented and medically necessary.",
                 confidence_score=0.60
             ))
 
         # Pattern 3: Total charge significantly higher than sum of averages
-        total_expected = sum(
-            self._get_avg_charge(p.cpt) for p in claim.procedure_codes
-        )
+        total_expected = sum(avg_charges)
 
         if total_expected > 0:
             total_variance = (claim.total_charge - total_expected) / total_expected
 
             if total_variance > 0.75:  # 75% higher than expected
-                issues.append(ValidationIssue(
-                    agent_name="Cost Analyzer",
+                issues.append(_issue(
                     issue_type="high_total_charge",
                     severity=IssueSeverity.MEDIUM,
                     description=f"Total charge ${claim.total_charge:.2f} is {total_variance*100:.0f}% above expected ${total_expected:.2f}",
@@ -130,5 +149,5 @@ class CostAnalyzer:
 
     def _get_avg_charge(self, cpt_code: str) -> float:
         """Get average charge for CPT code"""
-        cpt = self.db.query(CPTCode).filter(CPTCode.code == cpt_code).first()
+        cpt = self._cpt_cache.get(cpt_code)
         return cpt.avg_charge if cpt and cpt.avg_charge else 0.0
@@ -1,20 +1,59 @@
-from typing import List
+from typing import Dict, List, Optional
+from functools import partial
+import bisect
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue, IssueSeverity
-from app.database.models import ICD10Code, CPTCode
+from app.agents import reference_cache
+
+_issue = partial(ValidationIssue.from_agent, "CPT-ICD Validator")
+
+# Preventive diagnosis codes
+PREVENTIVE_DX = frozenset({'Z00.00', 'Z00.01', 'Z00.121', 'Z00.129'})
+
+# High complexity E/M codes (99205, 99215, 99285)
+HIGH_COMPLEXITY_EM = frozenset({'99205', '99215', '99285', '99223', '99233'})
+
+# E/M codes are 992xx / 999xx
+_EM_PREFIXES = frozenset({'992', '999'})
+
+# Preventive visit code by patient age: (oldest age in bracket, code)
+_AGE_BUCKETS = [
+    (0, '99381'),   # Infant
+    (4, '99382'),   # 1-4 years
+    (11, '99383'),  # 5-11 years
+    (17, '99384'),  # 12-17 years
+    (39, '99385'),  # 18-39 years
+    (64, '99386'),  # 40-64 years
+]
+_AGE_BOUNDS = [age for age, _ in _AGE_BUCKETS]
+_SENIOR_PREVENTIVE_CODE = '99387'  # 65+ years
 
 
 class CPTICDValidator:
     """Validates CPT-ICD-10 code compatibility"""
 
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        cpt_cache: Optional[Dict[str, Row]] = None,
+        icd_cache: Optional[Dict[str, Row]] = None
+    ):
         self.db = db
+        # Reference rows prefetched by the orchestrator
+        self.cpt_cache = cpt_cache
+        self.icd_cache = icd_cache
+        self._dx_cat: Dict[str, str] = {}
+        self._cpt_cat: Dict[str, str] = {}
 
     def validate(self, claim: Claim) -> List[ValidationIssue]:
         """Run all CPT-ICD-10 validation checks"""
         issues = []
 
+        # Diagnosis and procedure categories (cached across claims)
+        self._load_categories(claim)
+
         # Check 1: E/M codes require valid diagnosis
         issues.extend(self._check_em_has_diagnosis(claim))
 
@@ -30,18 +69,20 @@ class CPTICDValidator:
         """E/M codes require at least one diagnosis"""
         issues = []
 
-        for proc in claim.procedure_codes:
-            # E/M codes start with 99
-            if proc.cpt.startswith('99') and proc.cpt[:3] in ['992', '999']:
-                if not claim.diagnosis_codes:
-                    issues.append(ValidationIssue(
-                        agent_name="CPT-ICD Validator",
-                        issue_type="missing_diagnosis",
-                        severity=IssueSeverity.HIGH,
-                        description=f"E/M code {proc.cpt} requires diagnosis",
-                        explanation="Evaluation & Management services must have documented diagnosis codes",
-                        confidence_score=0.95
-                    ))
+        # Only claims without any diagnosis can violate this rule
+        if claim.diagnosis_codes:
+            return issues
+
+        em_codes = [p for p in claim.procedure_codes if p.cpt[:3] in _EM_PREFIXES]
+
+        for proc in em_codes:
+            issues.append(_issue(
+                issue_type="missing_diagnosis",
+                severity=IssueSeverity.HIGH,
+                description=f"E/M code {proc.cpt} requires diagnosis",
+                explanation="Evaluation & Management services must have documented diagnosis codes",
+                confidence_score=0.95
+            ))
 
         return issues
 
@@ -49,28 +90,25 @@ class CPTICDValidator:
         """Preventive diagnoses shouldn't have high complexity E/M codes"""
         issues = []
 
-        # Preventive diagnosis codes
-        preventive_codes = ['Z00.00', 'Z00.01', 'Z00.121', 'Z00.129']
-
         # Check if any diagnosis is preventive
-        has_preventive = any(dx in preventive_codes for dx in claim.diagnosis_codes)
+        has_preventive = not PREVENTIVE_DX.isdisjoint(claim.diagnosis_codes)
 
         if has_preventive:
-            for proc in claim.procedure_codes:
-                # High complexity E/M codes (99205, 99215, 99285)
-                high_complexity = ['99205', '99215', '99285', '99223', '99233']
+            # Expected code depends only on the patient's age, resolve it once per claim
+            expected_code = None
+            expected_charge = None
 
-                if proc.cpt in high_complexity:
+            for proc in claim.procedure_codes:
+                if proc.cpt in HIGH_COMPLEXITY_EM:
                     # Get expected charge for appropriate code
-                    expected_code = self._get_appropriate_preventive_code(claim)
-                    expected_cpt = self.db.query(CPTCode).filter(
-                        CPTCode.code == expected_code
-                    ).first()
+                    if expected_code is None:
+                        expected_code = self._get_appropriate_preventive_code(claim)
+                        expected_ref = reference_cache.get_cpt(self.db, expected_code)
+                        expected_charge = expected_ref.avg_charge if expected_ref else None
 
-                    cost_diff = proc.charge - (expected_cpt.avg_charge if expected_cpt else 0)
+                    cost_diff = proc.charge - (expected_charge or 0)
 
-                    issues.append(ValidationIssue(
-                        agent_name="CPT-ICD Validator",
+                    issues.append(_issue(
                         issue_type="preventive_complexity_mismatch",
                         severity=IssueSeverity.HIGH,
                         description=f"High complexity code {proc.cpt} billed for routine preventive visit",
@@ -87,25 +125,22 @@ class CPTICDValidator:
         issues = []
 
         # Get diagnosis categories
-        dx_categories = []
-        for dx_code in claim.diagnosis_codes:
-            dx = self.db.query(ICD10Code).filter(ICD10Code.code == dx_code).first()
-            if dx and dx.category:
-                dx_categories.append(dx.category.lower())
+        dx_categories = [
+            self._dx_cat[dx_code] for dx_code in claim.diagnosis_codes
+            if self._dx_cat.get(dx_code)
+        ]
 
         # Get procedure categories
         for proc in claim.procedure_codes:
-            cpt = self.db.query(CPTCode).filter(CPTCode.code == proc.cpt).first()
+            proc_cat = self._cpt_cat.get(proc.cpt)
 
-            if cpt and cpt.category and dx_categories:
-                proc_cat = cpt.category.lower()
+            if proc_cat and dx_categories:
 
                 # Check for obvious mismatches
                 if 'gi procedures' in proc_cat and not any(
                     'digestive' in cat for cat in dx_categories
                 ):
-                    issues.append(ValidationIssue(
-                        agent_name="CPT-ICD Validator",
+                    issues.append(_issue(
                         issue_type="category_mismatch",
                         severity=IssueSeverity.MEDIUM,
                         description=f"GI procedure {proc.cpt} with non-digestive diagnosis",
@@ -115,22 +150,24 @@ class CPTICDValidator:
 
         return issues
 
+    def _load_categories(self, claim: Claim):
+        """Look up lowercased categories for the claim's diagnosis and procedure codes"""
+        dx_rows = self.icd_cache
+        if dx_rows is None:
+            dx_rows = reference_cache.get_icd10_codes(self.db, claim.diagnosis_codes)
+
+        cpt_rows = self.cpt_cache
+        if cpt_rows is None:
+            cpt_rows = reference_cache.get_cpt_codes(self.db, [p.cpt for p in claim.procedure_codes])
+
+        self._dx_cat = {code: (r.category or '').lower() for code, r in dx_rows.items()}
+        self._cpt_cat = {code: (r.category or '').lower() for code, r in cpt_rows.items()}
+
     def _get_appropriate_preventive_code(self, claim: Claim) -> str:
         """Get appropriate preventive code based on patient age"""
-        from datetime import datetime
         age = (claim.service_date - claim.patient.dob).days // 365
 
-        if age < 1:
-            return '99381'  # Infant
-        elif age <= 4:
-            return '99382'  # 1-4 years
-        elif age <= 11:
-            return '99383'  # 5-11 years
-        elif age <= 17:
-            return '99384'  # 12-17 years
-        elif age <= 39:
-            return '99385'  # 18-39 years
-        elif age <= 64:
-            return '99386'  # 40-64 years
-        else:
-            return '99387'  # 65+ years
+        idx = bisect.bisect_left(_AGE_BOUNDS, age)
+        if idx == len(_AGE_BUCKETS):
+            return _SENIOR_PREVENTIVE_CODE
+        return _AGE_BUCKETS[idx][1]
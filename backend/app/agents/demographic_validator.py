@@ -1,30 +1,161 @@
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from functools import lru_cache, partial
+from itertools import accumulate
+import bisect
 import json
 import os
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue, IssueSeverity
-from app.database.models import ICD10Code, CPTCode
+from app.agents import reference_cache
+
+_issue = partial(ValidationIssue.from_agent, "Demographic Validator")
+
+
+_SEVERITY_MAP = {severity.value: severity for severity in IssueSeverity}
+
+
+class DemographicRule(NamedTuple):
+    """A demographic rule with its JSON fields resolved once at load time"""
+    code_range: Optional[Tuple]  # compiled by _compile_code_range
+    description: str
+    gender: Optional[str]
+    age_min: Optional[int]
+    age_max: Optional[int]
+    severity: IssueSeverity
+    explanation: str
+    # Issue severities/confidence derived from the rule severity
+    gender_severity: IssueSeverity
+    gender_confidence: float
+    age_min_severity: IssueSeverity
+    # Static part of the gender issue description, e.g. ": <description> invalid for gender "
+    gender_suffix: str
+
+
+def _compile_rule(rule: dict) -> DemographicRule:
+    """Resolve a raw JSON rule into a DemographicRule"""
+    severity = _SEVERITY_MAP.get(rule.get('severity'), IssueSeverity.MEDIUM)
+    is_critical = severity is IssueSeverity.CRITICAL
+    description = rule.get('description', '')
+
+    return DemographicRule(
+        code_range=_compile_code_range(rule.get('code_range')),
+        description=description,
+        gender=rule.get('gender'),
+        age_min=rule.get('age_min'),
+        age_max=rule.get('age_max'),
+        severity=severity,
+        explanation=rule.get('explanation', ''),
+        gender_severity=IssueSeverity.CRITICAL if is_critical else IssueSeverity.HIGH,
+        gender_confidence=0.99 if is_critical else 0.90,
+        age_min_severity=IssueSeverity.HIGH if severity is IssueSeverity.HIGH else IssueSeverity.MEDIUM,
+        gender_suffix=f": {description} invalid for gender "
+    )
+
+
+def _compile_code_range(code_range) -> Optional[Tuple]:
+    """Parse a JSON code_range into ('range', lo, hi), ('exact', code) or ('list', codes)"""
+    if isinstance(code_range, list):
+        return ('list', frozenset(code_range))
+
+    if isinstance(code_range, str):
+        if '-' in code_range:
+            # Range like "O00-O9A"
+            start, end = code_range.split('-')
+            return ('range', start, end)
+        else:
+            # Single code
+            return ('exact', code_range)
+
+    return None
+
+
+def _code_in_range(code: str, code_range: Optional[Tuple]) -> bool:
+    """Check if code matches a compiled code_range"""
+    if code_range is None:
+        return False
+
+    tag = code_range[0]
+    if tag == 'range':
+        return code_range[1] <= code <= code_range[2]
+    if tag == 'exact':
+        return code == code_range[1]
+    return code in code_range[1]
+
+
+class RuleIndex:
+    """Finds the demographic rules whose code_range covers a code.
+
+    "A-B" range rules are sorted by start code so candidates are located with
+    bisect instead of scanning every rule; single-code and list rules are
+    checked directly. Matches are returned in the order the rules were defined.
+    """
+
+    def __init__(self, rules: List[DemographicRule]):
+        self.rules = tuple(rules)
+        self._others = []
+        ranges = []
+
+        for order, rule in enumerate(self.rules):
+            if rule.code_range and rule.code_range[0] == 'range':
+                _, start, end = rule.code_range
+                ranges.append((start, end, order, rule))
+            else:
+                self._others.append((order, rule))
+
+        ranges.sort(key=lambda r: r[0])
+        self._ranges = ranges
+        self._starts = [r[0] for r in ranges]
+        # Running max of range ends lets the leftward walk stop at the first
+        # position no earlier range can reach, even if ranges overlap
+        self._max_ends = list(accumulate((r[1] for r in ranges), max))
+
+    def match(self, code: str) -> List[DemographicRule]:
+        """Return all rules whose code_range contains code"""
+        matched = []
+
+        idx = bisect.bisect_right(self._starts, code) - 1
+        while idx >= 0 and code <= self._max_ends[idx]:
+            _, end, order, rule = self._ranges[idx]
+            if code <= end:
+                matched.append((order, rule))
+            idx -= 1
+
+        for order, rule in self._others:
+            if _code_in_range(code, rule.code_range):
+                matched.append((order, rule))
+
+        matched.sort(key=lambda m: m[0])
+        return [rule for _, rule in matched]
+
+
+@lru_cache(maxsize=1)
+def _load_demographic_rules() -> Dict[str, RuleIndex]:
+    """Load and compile demographic rules from JSON (parsed once per process)"""
+    rules_path = os.path.join(
+        os.path.dirname(__file__),
+        '../../data/raw/demographic_rules.json'
+    )
+    try:
+        with open(rules_path, 'r') as f:
+            raw = json.load(f)
+    except Exception:
+        raw = {}
+
+    return {
+        'icd10_rules': RuleIndex([_compile_rule(r) for r in raw.get('icd10_rules', {}).values()]),
+        'cpt_rules': RuleIndex([_compile_rule(r) for r in raw.get('cpt_rules', {}).values()]),
+    }
 
 
 class DemographicValidator:
     """Validates age/gender restrictions on codes"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, icd_cache: Optional[Dict[str, Row]] = None):
         self.db = db
-        self.demographic_rules = self._load_demographic_rules()
-
-    def _load_demographic_rules(self) -> dict:
-        """Load demographic rules from JSON"""
-        rules_path = os.path.join(
-            os.path.dirname(__file__),
-            '../../data/raw/demographic_rules.json'
-        )
-        try:
-            with open(rules_path, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return {"icd10_rules": {}, "cpt_rules": {}}
+        self.icd_cache = icd_cache  # ICD-10 rows prefetched by the orchestrator
+        self.demographic_rules = _load_demographic_rules()
 
     def validate(self, claim: Claim) -> List[ValidationIssue]:
         """Run demographic validation checks"""
@@ -47,15 +178,19 @@ class DemographicValidator:
         """Check ICD-10 age/gender restrictions"""
         issues = []
 
+        # Restrictions for every diagnosis on the claim (cached across claims)
+        dx_map = self.icd_cache
+        if dx_map is None:
+            dx_map = reference_cache.get_icd10_codes(self.db, claim.diagnosis_codes)
+
         for dx_code in claim.diagnosis_codes:
             # Check database restrictions
-            dx = self.db.query(ICD10Code).filter(ICD10Code.code == dx_code).first()
+            dx = dx_map.get(dx_code)
 
             if dx:
                 # Gender restriction
                 if dx.gender_restriction and claim.patient.gender != dx.gender_restriction:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                    issues.append(_issue(
                         issue_type="gender_restriction",
                         severity=IssueSeverity.CRITICAL,
                         description=f"ICD-10 {dx_code} ({dx.description}) invalid for gender {claim.patient.gender}",
@@ -65,8 +200,7 @@ class DemographicValidator:
 
                 # Age restrictions
                 if dx.age_min is not None and patient_age < dx.age_min:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                    issues.append(_issue(
                         issue_type="age_restriction",
                         severity=IssueSeverity.HIGH,
                         description=f"ICD-10 {dx_code} invalid for age {patient_age}",
@@ -75,8 +209,7 @@ class DemographicValidator:
                     ))
 
                 if dx.age_max is not None and patient_age > dx.age_max:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                    issues.append(_issue(
                         issue_type="age_restriction",
                         severity=IssueSeverity.MEDIUM,
                         description=f"ICD-10 {dx_code} unusual for age {patient_age}",
@@ -92,109 +225,89 @@ class DemographicValidator:
     def _check_icd10_range_rules(self, dx_code: str, gender: str, age: int) -> List[ValidationIssue]:
         """Check ICD-10 code against range-based rules"""
         issues = []
-        rules = self.demographic_rules.get('icd10_rules', {})
+        rules = self.demographic_rules['icd10_rules']
+
+        # Only rules whose code range covers this code
+        for rule in rules.match(dx_code):
+            # Check gender
+            if rule.gender and gender != rule.gender:
+                issues.append(_issue(
+                    issue_type="gender_restriction",
+                    severity=rule.gender_severity,
+                    description=f"ICD-10 {dx_code}{rule.gender_suffix}{gender}",
+                    explanation=rule.explanation,
+                    confidence_score=rule.gender_confidence
+                ))
+
+            # Check age
+            age_min = rule.age_min
+            age_max = rule.age_max
+
+            if age_min and age < age_min:
+                issues.append(_issue(
+                    issue_type="age_restriction",
+                    severity=rule.age_min_severity,
+                    description=f"ICD-10 {dx_code} invalid for age {age} (minimum {age_min})",
+                    explanation=rule.explanation,
+                    confidence_score=0.85
+                ))
+
+            if age_max and age > age_max:
+                issues.append(_issue(
+                    issue_type="age_restriction",
+                    severity=IssueSeverity.MEDIUM,
+                    description=f"ICD-10 {dx_code} unusual for age {age} (typically max {age_max})",
+                    explanation=rule.explanation,
+                    confidence_score=0.70
+                ))
+
+        return issues
+
+    def _check_cpt_restrictions(self, claim: Claim, patient_age: int) -> List[ValidationIssue]:
+        """Check CPT age/gender restrictions"""
+        issues = []
+        rules = self.demographic_rules['cpt_rules']
+        gender = claim.patient.gender
+        procs = claim.procedure_codes
+
+        # Bucket procedures by code so repeated CPTs share one rule lookup
+        rules_by_cpt = {}
+        for proc in procs:
+            if proc.cpt not in rules_by_cpt:
+                rules_by_cpt[proc.cpt] = rules.match(proc.cpt)
 
-        for rule_name, rule in rules.items():
-            code_range = rule.get('code_range')
+        for proc in procs:
+            for rule in rules_by_cpt[proc.cpt]:
+                age_min = rule.age_min
+                age_max = rule.age_max
 
-            # Check if code matches range
-            if self._code_in_range(dx_code, code_range):
                 # Check gender
-                if rule.get('gender') and gender != rule['gender']:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                if rule.gender and gender != rule.gender:
+                    issues.append(_issue(
                         issue_type="gender_restriction",
-                        severity=IssueSeverity.CRITICAL if rule['severity'] == 'critical' else IssueSeverity.HIGH,
-                        description=f"ICD-10 {dx_code}: {rule['description']} invalid for gender {gender}",
-                        explanation=rule['explanation'],
-                        confidence_score=0.99 if rule['severity'] == 'critical' else 0.90
+                        severity=IssueSeverity.HIGH,
+                        description=f"CPT {proc.cpt}{rule.gender_suffix}{gender}",
+                        explanation=rule.explanation,
+                        confidence_score=0.90
                     ))
 
                 # Check age
-                age_min = rule.get('age_min')
-                age_max = rule.get('age_max')
-
-                if age_min and age < age_min:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                if age_min and patient_age < age_min:
+                    issues.append(_issue(
                         issue_type="age_restriction",
-                        severity=IssueSeverity.HIGH if rule['severity'] == 'high' else IssueSeverity.MEDIUM,
-                        description=f"ICD-10 {dx_code} invalid for age {age} (minimum {age_min})",
-                        explanation=rule['explanation'],
-                        confidence_score=0.85
+                        severity=IssueSeverity.HIGH,
+                        description=f"CPT {proc.cpt} invalid for age {patient_age} (minimum {age_min})",
+                        explanation=rule.explanation,
+                        confidence_score=0.90
                     ))
 
-                if age_max and age > age_max:
-                    issues.append(ValidationIssue(
-                        agent_name="Demographic Validator",
+                if age_max and patient_age > age_max:
+                    issues.append(_issue(
                         issue_type="age_restriction",
-                        severity=IssueSeverity.MEDIUM,
-                        description=f"ICD-10 {dx_code} unusual for age {age} (typically max {age_max})",
-                        explanation=rule['explanation'],
-                        confidence_score=0.70
+                        severity=IssueSeverity.HIGH,
+                        description=f"CPT {proc.cpt} invalid for age {patient_age} (maximum {age_max})",
+                        explanation=rule.explanation,
+                        confidence_score=0.90
                     ))
 
         return issues
-
-    def _check_cpt_restrictions(self, claim: Claim, patient_age: int) -> List[ValidationIssue]:
-        """Check CPT age/gender restrictions"""
-        issues = []
-        rules = self.demographic_rules.get('cpt_rules', {})
-
-        for proc in claim.procedure_codes:
-            for rule_name, rule in rules.items():
-                code_range = rule.get('code_range')
-
-                if self._code_in_range(proc.cpt, code_range):
-                    # Check gender
-                    if rule.get('gender') and claim.patient.gender != rule['gender']:
-                        issues.append(ValidationIssue(
-                            agent_name="Demographic Validator",
-                            issue_type="gender_restriction",
-                            severity=IssueSeverity.HIGH,
-                            description=f"CPT {proc.cpt}: {rule['description']} invalid for gender {claim.patient.gender}",
-                            explanation=rule['explanation'],
-                            confidence_score=0.90
-                        ))
-
-                    # Check age
-                    age_min = rule.get('age_min')
-                    age_max = rule.get('age_max')
-
-                    if age_min and patient_age < age_min:
-                        issues.append(ValidationIssue(
-                            agent_name="Demographic Validator",
-                            issue_type="age_restriction",
-                            severity=IssueSeverity.HIGH,
-                            description=f"CPT {proc.cpt} invalid for age {patient_age} (minimum {age_min})",
-                            explanation=rule['explanation'],
-                            confidence_score=0.90
-                        ))
-
-                    if age_max and patient_age > age_max:
-                        issues.append(ValidationIssue(
-                            agent_name="Demographic Validator",
-                            issue_type="age_restriction",
-                            severity=IssueSeverity.HIGH,
-                            description=f"CPT {proc.cpt} invalid for age {patient_age} (maximum {age_max})",
-                            explanation=rule['explanation'],
-                            confidence_score=0.90
-                        ))
-
-        return issues
-
-    def _code_in_range(self, code: str, code_range) -> bool:
-        """Check if code is in range (handles single codes or ranges like O00-O9A)"""
-        if isinstance(code_range, list):
-            return code in code_range
-
-        if isinstance(code_range, str):
-            if '-' in code_range:
-                # Range like "O00-O9A"
-                start, end = code_range.split('-')
-                return start <= code <= end
-            else:
-                # Single code
-                return code == code_range
-
-        return False
@@ -1,45 +1,68 @@
-from typing import List
+from typing import FrozenSet, List
+from functools import lru_cache, partial
 import json
 import os
 from sqlalchemy.orm import Session
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue, IssueSeverity
 
+_issue = partial(ValidationIssue.from_agent, "Modifier Validator")
+
+# Preventive codes don't need modifier 25
+_PREVENTIVE_CODES = frozenset({
+    '99381', '99382', '99383', '99384', '99385', '99386', '99387',
+    '99391', '99392', '99393', '99394', '99395', '99396', '99397',
+})
+
+# E/M codes are 992xx / 999xx
+_EM_PREFIXES = frozenset({'992', '999'})
+
+# More specific alternatives to modifier 59
+_X_MODIFIERS = frozenset({'XE', 'XP', 'XS', 'XU'})
+
+_LATERALITY_MODIFIERS = frozenset({'LT', 'RT'})
+_COMPONENT_MODIFIERS = frozenset({'TC', '26'})
+
+
+@lru_cache(maxsize=1)
+def _load_modifier_rules() -> dict:
+    """Load modifier rules from JSON (parsed once per process)"""
+    rules_path = os.path.join(
+        os.path.dirname(__file__),
+        '../../data/raw/modifier_rules.json'
+    )
+    try:
+        with open(rules_path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
 
 class ModifierValidator:
     """Validates correct usage of modifiers"""
 
     def __init__(self, db: Session):
         self.db = db
-        self.modifier_rules = self._load_modifier_rules()
-
-    def _load_modifier_rules(self) -> dict:
-        """Load modifier rules from JSON"""
-        rules_path = os.path.join(
-            os.path.dirname(__file__),
-            '../../data/raw/modifier_rules.json'
-        )
-        try:
-            with open(rules_path, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        self.modifier_rules = _load_modifier_rules()
 
     def validate(self, claim: Claim) -> List[ValidationIssue]:
         """Run modifier validation checks"""
         issues = []
 
+        # Modifier set of each procedure, shared by the per-procedure checks
+        modifier_sets = [frozenset(p.modifiers) for p in claim.procedure_codes]
+
         # Check 1: Modifier 25 required for E/M + procedure same day
         issues.extend(self._check_modifier_25(claim))
 
         # Check 2: Modifier 59/X{EPSU} conflicts
-        issues.extend(self._check_modifier_59_conflicts(claim))
+        issues.extend(self._check_modifier_59_conflicts(claim, modifier_sets))
 
         # Check 3: Bilateral modifier usage
-        issues.extend(self._check_bilateral_modifiers(claim))
+        issues.extend(self._check_bilateral_modifiers(claim, modifier_sets))
 
         # Check 4: Invalid modifier combinations
-        issues.extend(self._check_invalid_combinations(claim))
+        issues.extend(self._check_invalid_combinations(claim, modifier_sets))
 
         return issues
 
@@ -47,46 +70,46 @@ class ModifierValidator:
         """Check if modifier 25 is needed for E/M + procedure same day"""
         issues = []
 
-        em_codes = [p for p in claim.procedure_codes if p.cpt.startswith('99') and p.cpt[:3] in ['992', '999']]
-        other_procs = [p for p in claim.procedure_codes if not (p.cpt.startswith('99') and p.cpt[:3] in ['992', '999'])]
-
-        # Preventive codes don't need modifier 25
-        preventive_codes = ['99381', '99382', '99383', '99384', '99385', '99386', '99387',
-                           '99391', '99392', '99393', '99394', '99395', '99396', '99397']
-
-        if em_codes and other_procs:
-            for em in em_codes:
-                # Skip preventive codes
-                if em.cpt in preventive_codes:
-                    continue
-
-                if '25' not in em.modifiers:
-                    issues.append(ValidationIssue(
-                        agent_name="Modifier Validator",
-                        issue_type="missing_modifier_25",
-                        severity=IssueSeverity.MEDIUM,
-                        description=f"Modifier 25 required on E/M code {em.cpt} when billed with procedure",
-                        explanation="When billing E/M service on same day as procedure, modifier 25 indicates the E/M was significant and separately identifiable",
-                        confidence_score=0.88,
-                        suggested_fix=f"Add modifier 25 to {em.cpt}"
-                    ))
+        # Split E/M codes from other procedures in one pass
+        em_codes = []
+        other_procs = []
+        for p in claim.procedure_codes:
+            (em_codes if p.cpt[:3] in _EM_PREFIXES else other_procs).append(p)
+
+        if not em_codes or not other_procs:
+            return issues
+
+        for em in em_codes:
+            # Skip preventive codes
+            if em.cpt in _PREVENTIVE_CODES:
+                continue
+
+            if '25' not in em.modifiers:
+                issues.append(_issue(
+                    issue_type="missing_modifier_25",
+                    severity=IssueSeverity.MEDIUM,
+                    description=f"Modifier 25 required on E/M code {em.cpt} when billed with procedure",
+                    explanation="When billing E/M service on same day as procedure, modifier 25 indicates the E/M was significant and separately identifiable",
+                    confidence_score=0.88,
+                    suggested_fix=f"Add modifier 25 to {em.cpt}"
+                ))
 
         return issues
 
-    def _check_modifier_59_conflicts(self, claim: Claim) -> List[ValidationIssue]:
+    def _check_modifier_59_conflicts(
+        self, claim: Claim, modifier_sets: List[FrozenSet[str]]
+    ) -> List[ValidationIssue]:
         """Check for conflicts between 59 and X{EPSU} modifiers"""
         issues = []
 
-        x_modifiers = ['XE', 'XP', 'XS', 'XU']
+        for proc, mods in zip(claim.procedure_codes, modifier_sets):
+            if '59' not in mods:
+                continue
 
-        for proc in claim.procedure_codes:
-            has_59 = '59' in proc.modifiers
-            has_x = any(xm in proc.modifiers for xm in x_modifiers)
+            x_used = sorted(_X_MODIFIERS & mods)
 
-            if has_59 and has_x:
-                x_used = [xm for xm in x_modifiers if xm in proc.modifiers]
-                issues.append(ValidationIssue(
-                    agent_name="Modifier Validator",
+            if x_used:
+                issues.append(_issue(
                     issue_type="modifier_conflict",
                     severity=IssueSeverity.MEDIUM,
                     description=f"CPT {proc.cpt} has both modifier 59 and {', '.join(x_used)}",
@@ -97,16 +120,17 @@ class ModifierValidator:
 
         return issues
 
-    def _check_bilateral_modifiers(self, claim: Claim) -> List[ValidationIssue]:
+    def _check_bilateral_modifiers(
+        self, claim: Claim, modifier_sets: List[FrozenSet[str]]
+    ) -> List[ValidationIssue]:
         """Check bilateral modifier (50) usage"""
         issues = []
 
-        for proc in claim.procedure_codes:
-            if '50' in proc.modifiers:
+        for proc, mods in zip(claim.procedure_codes, modifier_sets):
+            if '50' in mods:
                 # Check if also has LT or RT (conflict)
-                if 'LT' in proc.modifiers or 'RT' in proc.modifiers:
-                    issues.append(ValidationIssue(
-                        agent_name="Modifier Validator",
+                if not _LATERALITY_MODIFIERS.isdisjoint(mods):
+                    issues.append(_issue(
                         issue_type="modifier_conflict",
                         severity=IssueSeverity.HIGH,
                         description=f"CPT {proc.cpt} has modifier 50 with LT/RT",
@@ -117,15 +141,16 @@ class ModifierValidator:
 
         return issues
 
-    def _check_invalid_combinations(self, claim: Claim) -> List[ValidationIssue]:
+    def _check_invalid_combinations(
+        self, claim: Claim, modifier_sets: List[FrozenSet[str]]
+    ) -> List[ValidationIssue]:
         """Check for invalid modifier combinations"""
         issues = []
 
-        for proc in claim.procedure_codes:
+        for proc, mods in zip(claim.procedure_codes, modifier_sets):
             # TC and 26 cannot be used together
-            if 'TC' in proc.modifiers and '26' in proc.modifiers:
-                issues.append(ValidationIssue(
-                    agent_name="Modifier Validator",
+            if _COMPONENT_MODIFIERS <= mods:
+                issues.append(_issue(
                     issue_type="modifier_conflict",
                     severity=IssueSeverity.CRITICAL,
                     description=f"CPT {proc.cpt} has both TC and 26 modifiers",
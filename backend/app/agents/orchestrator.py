@@ -1,89 +1,109 @@
-from typing import TypedDict, List, Annotated
-from datetime import datetime
+from typing import Any, Dict, TypedDict, List, Annotated, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+import time
 from langgraph.graph import StateGraph, START, END
 from sqlalchemy.orm import Session
 import operator
 
 from app.models.claim import Claim
-from app.models.validation import ValidationIssue, ValidationResult
+from app.models.validation import ValidationIssue, ValidationResult, IssueSeverity
 from app.agents.cpt_icd_validator import CPTICDValidator
 from app.agents.bundling_validator import BundlingValidator
 from app.agents.modifier_validator import ModifierValidator
 from app.agents.demographic_validator import DemographicValidator
 from app.agents.cost_analyzer import CostAnalyzer
+from app.agents import reference_cache
 from app.services.llm_service import LLMService
 from app.database.connection import SessionLocal
 
+# Risk score contribution of each issue
+SEVERITY_WEIGHTS = {
+    IssueSeverity.CRITICAL: 25,
+    IssueSeverity.HIGH: 15,
+    IssueSeverity.MEDIUM: 8,
+    IssueSeverity.LOW: 3
+}
+
 
 class ValidationState(TypedDict):
     """State passed between nodes in the workflow"""
     claim: Claim
+    db: Session  # One session per claim, shared by all nodes
     issues: Annotated[List[ValidationIssue], operator.add]  # Accumulate issues from all agents
-    start_time: float
+    start_time_ns: int  # perf_counter_ns() when validation started
+    cpt_refs: Dict[str, Any]  # CPT reference rows shared by all agents
+    icd_refs: Dict[str, Any]  # ICD-10 reference rows shared by all agents
+    ncci_edits: Dict[Any, str]  # NCCI edits between the claim's codes
 
 
 class ClaimValidationOrchestrator:
     """Orchestrates multiple validation agents using LangGraph"""
 
-    def __init__(self, db: Session, llm_service: LLMService = None):
+    def __init__(self, db: Session = None, llm_service: LLMService = None):
+        # Default session for validate_claim; None opens one per claim. The
+        # orchestrator itself is stateless per claim and safe to share.
         self.db = db
         self.llm_service = llm_service or LLMService()
+        # One worker per validation agent, reused across claims
+        self._agent_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="validation-agent")
         self.workflow = self._build_workflow()
 
     def _build_workflow(self) -> StateGraph:
-        """Build parallel LangGraph workflow"""
+        """Build LangGraph workflow"""
 
         workflow = StateGraph(ValidationState)
 
-        # Add agent nodes
-        workflow.add_node("cpt_icd", self._run_cpt_icd)
-        workflow.add_node("bundling", self._run_bundling)
-        workflow.add_node("modifier", self._run_modifier)
-        workflow.add_node("demographic", self._run_demographic)
-        workflow.add_node("cost", self._run_cost)
+        # Add nodes
+        workflow.add_node("prefetch", self._prefetch_reference_data)
+        workflow.add_node("agents", self._run_agents)
         workflow.add_node("aggregate", self._aggregate_results)
         workflow.add_node("explain", self._add_explanations)
 
-        # Parallel execution: All agents start simultaneously
-        workflow.add_edge(START, "cpt_icd")
-        workflow.add_edge(START, "bundling")
-        workflow.add_edge(START, "modifier")
-        workflow.add_edge(START, "demographic")
-        workflow.add_edge(START, "cost")
-
-        # All agents converge to aggregator
-        workflow.add_edge("cpt_icd", "aggregate")
-        workflow.add_edge("bundling", "aggregate")
-        workflow.add_edge("modifier", "aggregate")
-        workflow.add_edge("demographic", "aggregate")
-        workflow.add_edge("cost", "aggregate")
-
-        # Final explanation enhancement
-        workflow.add_edge("aggregate", "explain")
+        # Reference data is fetched once, then all agents run simultaneously
+        workflow.add_edge(START, "prefetch")
+        workflow.add_edge("prefetch", "agents")
+        workflow.add_edge("agents", "aggregate")
+
+        # Final explanation enhancement, skipped for clean claims
+        workflow.add_conditional_edges(
+            "aggregate",
+            self._route_after_aggregate,
+            {"explain": "explain", END: END}
+        )
         workflow.add_edge("explain", END)
 
         return workflow.compile()
 
-    def validate_claim(self, claim: Claim) -> ValidationResult:
+    def validate_claim(self, claim: Claim, db: Session = None) -> ValidationResult:
         """Run full validation workflow on a claim"""
 
-        initial_state: ValidationState = {
-            "claim": claim,
-            "issues": [],
-            "start_time": datetime.now().timestamp()
-        }
+        if db is None:
+            db = self.db
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
 
-        # Execute workflow
-        final_state = self.workflow.invoke(initial_state)
+        try:
+            initial_state: ValidationState = {
+                "claim": claim,
+                "db": db,
+                "issues": [],
+                "start_time_ns": time.perf_counter_ns(),
+                "cpt_refs": {},
+                "icd_refs": {},
+                "ncci_edits": {}
+            }
+
+            # Execute workflow
+            final_state = self.workflow.invoke(initial_state)
+        finally:
+            if owns_session:
+                db.close()
 
         # Calculate metrics
-        processing_time = int((datetime.now().timestamp() - final_state["start_time"]) * 1000)
-        risk_score = self._calculate_risk_score(final_state["issues"])
-        status = self._determine_status(final_state["issues"])
-        total_cost_impact = sum(
-            issue.cost_impact for issue in final_state["issues"]
-            if issue.cost_impact is not None
-        )
+        processing_time = (time.perf_counter_ns() - final_state["start_time_ns"]) // 1_000_000
+        risk_score, status, total_cost_impact = self._score_issues(final_state["issues"])
 
         return ValidationResult(
             claim_id=claim.claim_id,
@@ -94,102 +114,103 @@ class ClaimValidationOrchestrator:
             processing_time_ms=processing_time
         )
 
-    # Agent execution functions
-    def _run_cpt_icd(self, state: ValidationState) -> dict:
+    def _prefetch_reference_data(self, state: ValidationState) -> dict:
+        """Fetch reference rows and NCCI edits for the claim once, for all agents"""
+        claim = state["claim"]
+        db = state["db"]
+        codes = [p.cpt for p in claim.procedure_codes]
+
+        cpt_refs = reference_cache.get_cpt_codes(db, codes)
+        icd_refs = reference_cache.get_icd10_codes(db, claim.diagnosis_codes)
+        # Bundling only applies to claims with two or more procedures
+        ncci_edits = reference_cache.get_ncci_edits(db, codes) if len(codes) > 1 else {}
+
+        return {"cpt_refs": cpt_refs, "icd_refs": icd_refs, "ncci_edits": ncci_edits}
+
+    def _run_agents(self, state: ValidationState) -> dict:
+        """Run all validation agents concurrently and collect their issues"""
+        agents = (self._run_cpt_icd, self._run_bundling, self._run_modifier, self._run_demographic, self._run_cost)
+        futures = [self._agent_executor.submit(agent, state) for agent in agents]
+        new_issues = list(chain.from_iterable(future.result() for future in futures))
+        return {"issues": new_issues}
+
+    # Agent execution functions. They run in parallel, so only the CPT-ICD validator
+    # gets the session (for its preventive charge lookup); the others work purely
+    # from the prefetched reference data and are given no session at all.
+    def _run_cpt_icd(self, state: ValidationState) -> List[ValidationIssue]:
         """Execute CPT-ICD-10 validator"""
-        db = SessionLocal()
-        try:
-            validator = CPTICDValidator(db)
-            new_issues = validator.validate(state["claim"])
-        finally:
-            db.close()
-        return {"issues": new_issues}  # Return only new issues, LangGraph will accumulate
+        validator = CPTICDValidator(state["db"], cpt_cache=state["cpt_refs"], icd_cache=state["icd_refs"])
+        new_issues = validator.validate(state["claim"])
+        return new_issues
 
-    def _run_bundling(self, state: ValidationState) -> dict:
+    def _run_bundling(self, state: ValidationState) -> List[ValidationIssue]:
         """Execute bundling validator"""
-        db = SessionLocal()
-        try:
-            validator = BundlingValidator(db)
-            new_issues = validator.validate(state["claim"])
-        finally:
-            db.close()
-        return {"issues": new_issues}
+        validator = BundlingValidator(db=None, ncci_map=state["ncci_edits"])
+        new_issues = validator.validate(state["claim"])
+        return new_issues
 
-    def _run_modifier(self, state: ValidationState) -> dict:
+    def _run_modifier(self, state: ValidationState) -> List[ValidationIssue]:
         """Execute modifier validator"""
-        db = SessionLocal()
-        try:
-            validator = ModifierValidator(db)
-            new_issues = validator.validate(state["claim"])
-        finally:
-            db.close()
-        return {"issues": new_issues}
+        validator = ModifierValidator(db=None)
+        new_issues = validator.validate(state["claim"])
+        return new_issues
 
-    def _run_demographic(self, state: ValidationState) -> dict:
+    def _run_demographic(self, state: ValidationState) -> List[ValidationIssue]:
         """Execute demographic validator"""
-        db = SessionLocal()
-        try:
-            validator = DemographicValidator(db)
-            new_issues = validator.validate(state["claim"])
-        finally:
-            db.close()
-        return {"issues": new_issues}
+        validator = DemographicValidator(db=None, icd_cache=state["icd_refs"])
+        new_issues = validator.validate(state["claim"])
+        return new_issues
 
-    def _run_cost(self, state: ValidationState) -> dict:
+    def _run_cost(self, state: ValidationState) -> List[ValidationIssue]:
         """Execute cost analyzer"""
-        db = SessionLocal()
-        try:
-            analyzer = CostAnalyzer(db)
-            new_issues = analyzer.validate(state["claim"])
-        finally:
-            db.close()
-        return {"issues": new_issues}
+        analyzer = CostAnalyzer(db=None, cpt_cache=state["cpt_refs"])
+        new_issues = analyzer.validate(state["claim"])
+        return new_issues
 
     def _aggregate_results(self, state: ValidationState) -> dict:
         """Aggregate and sort issues by severity"""
         # Sort issues by severity (critical first)
-        severity_order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-        state["issues"].sort(
-            key=lambda x: severity_order.get(x.severity.value, 4)
-        )
+        state["issues"].sort(key=operator.attrgetter("severity.rank"))
         return {"issues": []}  # Return empty list - adds nothing but satisfies LangGraph
 
+    def _route_after_aggregate(self, state: ValidationState) -> str:
+        """Only claims with issues need explanations"""
+        return "explain" if state["issues"] else END
+
     def _add_explanations(self, state: ValidationState) -> dict:
         """Enhance issues with LLM-generated explanations"""
-        for issue in state["issues"]:
-            # Only enhance if explanation is basic/empty
-            if len(issue.explanation) < 50:  # Basic explanation threshold
-                enhanced = self.llm_service.explain_issue(issue, state["claim"])
-                issue.explanation = enhanced
+        # Only enhance if explanation is basic/empty
+        needs_explanation = [
+            issue for issue in state["issues"]
+            if len(issue.explanation) < 50  # Basic explanation threshold
+        ]
+
+        if not needs_explanation:
+            return {"issues": []}
+
+        # One LLM call for all of the claim's issues
+        explanations = self.llm_service.explain_issues_batch(needs_explanation, state["claim"])
+        for issue, explanation in zip(needs_explanation, explanations):
+            issue.explanation = explanation
         return {"issues": []}  # Return empty list - adds nothing but satisfies LangGraph
 
-    def _calculate_risk_score(self, issues: List[ValidationIssue]) -> float:
-        """Calculate risk score from 0-100"""
+    def _score_issues(self, issues: List[ValidationIssue]) -> Tuple[float, str, float]:
+        """Calculate risk score (0-100), overall status and total cost impact in one pass"""
         if not issues:
-            return 0.0
-
-        severity_weights = {
-            "critical": 25,
-            "high": 15,
-            "medium": 8,
-            "low": 3
-        }
-
-        score = sum(
-            severity_weights.get(issue.severity.value, 0)
-            for issue in issues
-        )
+            return 0.0, "passed", 0.0
 
-        return min(score, 100.0)
+        score = 0
+        total_cost_impact = 0
+        has_critical = False
 
-    def _determine_status(self, issues: List[ValidationIssue]) -> str:
-        """Determine overall claim status"""
-        if not issues:
-            return "passed"
+        for issue in issues:
+            score += SEVERITY_WEIGHTS[issue.severity]
+            if issue.cost_impact is not None:
+                total_cost_impact += issue.cost_impact
+            if issue.severity is IssueSeverity.CRITICAL:
+                has_critical = True
 
-        # Check for critical issues
-        has_critical = any(issue.severity.value == "critical" for issue in issues)
-        if has_critical:
-            return "rejected"
+        # Any critical issue rejects the claim
+        status = "rejected" if has_critical else "flagged"
 
-        return "flagged"
+        return min(score, 100.0), status, total_cost_impact
@@ -0,0 +1,155 @@
+"""
+Process-wide cache of CPT / ICD-10 / NCCI reference data
+
+CPT and ICD-10 rows are static reference data, so once a code has been looked
+up it is kept in memory and reused by every validator for every later claim.
+Codes that are not cached yet are fetched together in a single IN query, and
+codes that don't exist in the database are remembered as misses too.
+
+load_reference_data() (run at API startup) reads the whole CPT, ICD-10 and
+NCCI tables up front; after that, lookups never touch the database.
+
+Call invalidate() whenever the reference tables are reloaded.
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session
+from app.database.models import CPTCode, ICD10Code, NCCIEdit
+
+# Upper bound on cached codes (including misses) before the cache is reset
+MAX_CACHED_CODES = 200_000
+
+_CPT_COLUMNS = (CPTCode.code, CPTCode.avg_charge, CPTCode.category)
+_ICD10_COLUMNS = (
+    ICD10Code.code,
+    ICD10Code.description,
+    ICD10Code.category,
+    ICD10Code.gender_restriction,
+    ICD10Code.age_min,
+    ICD10Code.age_max,
+)
+
+# Marks a code that has never been looked up (None marks a known miss)
+_MISSING = object()
+
+_cpt_cache: Dict[str, Optional[Row]] = {}
+_icd10_cache: Dict[str, Optional[Row]] = {}
+
+# NCCI edits by column 1 code: {column1: {column2: modifier_indicator}}
+_ncci_index: Dict[str, Dict[str, str]] = {}
+
+# Set once load_reference_data() has read the full tables
+_fully_loaded = False
+
+
+def _lookup(db: Session, codes: Iterable[str], cache: Dict[str, Optional[Row]], columns) -> Dict[str, Row]:
+    """Return cached rows for codes, fetching any uncached codes in one query"""
+    result = {}
+    missing = []
+
+    for code in set(codes):
+        # Single read: other threads may clear the cache between two lookups
+        row = cache.get(code, _MISSING)
+        if row is _MISSING:
+            missing.append(code)
+        elif row is not None:
+            result[code] = row
+
+    # With the full tables loaded, uncached codes simply don't exist
+    if missing and not _fully_loaded:
+        code_column = columns[0]
+        rows = db.execute(select(*columns).where(code_column.in_(missing))).all()
+        fetched = {code: None for code in missing}
+        fetched.update((row.code, row) for row in rows)
+
+        if len(cache) + len(fetched) > MAX_CACHED_CODES:
+            cache.clear()
+        cache.update(fetched)
+
+        result.update((code, row) for code, row in fetched.items() if row is not None)
+
+    return result
+
+
+def get_cpt_codes(db: Session, codes: Iterable[str]) -> Dict[str, Row]:
+    """Get (code, avg_charge, category) rows for the given CPT codes"""
+    return _lookup(db, codes, _cpt_cache, _CPT_COLUMNS)
+
+
+def get_icd10_codes(db: Session, codes: Iterable[str]) -> Dict[str, Row]:
+    """Get (code, description, category, gender_restriction, age_min, age_max) rows for the given ICD-10 codes"""
+    return _lookup(db, codes, _icd10_cache, _ICD10_COLUMNS)
+
+
+def get_cpt(db: Session, code: str) -> Optional[Row]:
+    """Get the reference row for a single CPT code"""
+    return get_cpt_codes(db, (code,)).get(code)
+
+
+def get_icd10(db: Session, code: str) -> Optional[Row]:
+    """Get the reference row for a single ICD-10 code"""
+    return get_icd10_codes(db, (code,)).get(code)
+
+
+def get_ncci_edits(db: Session, codes: Iterable[str]) -> Dict[Tuple[str, str], str]:
+    """Get {(column1, column2): modifier_indicator} for all NCCI edits between the given codes"""
+    codes = list(set(codes))
+
+    if _fully_loaded:
+        ncci_map = {}
+        for column1_code in codes:
+            edits = _ncci_index.get(column1_code)
+            if edits:
+                for column2_code in codes:
+                    modifier_indicator = edits.get(column2_code)
+                    if modifier_indicator is not None:
+                        ncci_map[(column1_code, column2_code)] = modifier_indicator
+        return ncci_map
+
+    rows = db.execute(
+        select(
+            NCCIEdit.column1_code,
+            NCCIEdit.column2_code,
+            NCCIEdit.modifier_indicator
+        ).where(
+            NCCIEdit.column1_code.in_(codes),
+            NCCIEdit.column2_code.in_(codes)
+        )
+    ).all()
+
+    ncci_map = {}
+    for column1_code, column2_code, modifier_indicator in rows:
+        ncci_map.setdefault((column1_code, column2_code), modifier_indicator or '')
+    return ncci_map
+
+
+def load_reference_data(db: Session):
+    """Load the full CPT, ICD-10 and NCCI tables into memory"""
+    global _fully_loaded
+
+    cpt_rows = db.execute(select(*_CPT_COLUMNS)).all()
+    icd10_rows = db.execute(select(*_ICD10_COLUMNS)).all()
+    ncci_rows = db.execute(
+        select(
+            NCCIEdit.column1_code,
+            NCCIEdit.column2_code,
+            NCCIEdit.modifier_indicator
+        ).order_by(NCCIEdit.id)
+    ).all()
+
+    invalidate()
+    _cpt_cache.update((row.code, row) for row in cpt_rows)
+    _icd10_cache.update((row.code, row) for row in icd10_rows)
+    for column1_code, column2_code, modifier_indicator in ncci_rows:
+        _ncci_index.setdefault(column1_code, {}).setdefault(column2_code, modifier_indicator or '')
+    _fully_loaded = True
+
+
+def invalidate():
+    """Drop all cached reference data (call after reference tables change)"""
+    global _fully_loaded
+    _fully_loaded = False
+    _cpt_cache.clear()
+    _icd10_cache.clear()
+    _ncci_index.clear()
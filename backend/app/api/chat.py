@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from typing import List, Optional, Tuple
+from functools import lru_cache
+from threading import Lock
+from cachetools import TTLCache
 
 from app.database.connection import get_db
 from app.database import models as db_models
@@ -10,6 +14,11 @@ from app.services.llm_service import LLMService
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Reconstructed (claim, issues) per claim_id, reused for follow-up questions
+_context_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_context_lock = Lock()
+_invalidations = 0  # Bumped on every claim save, guards against caching stale loads
+
 
 class QuestionRequest(BaseModel):
     claim_id: str
@@ -22,21 +31,40 @@ class QuestionResponse(BaseModel):
     answer: str
 
 
-@router.post("/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest, db: Session = Depends(get_db)):
-    """Ask a question about a specific claim's validation results"""
+@lru_cache(maxsize=1)
+def _llm() -> LLMService:
+    """Shared LLM service (one client per process)"""
+    return LLMService()
+
+
+def invalidate_claim_context(claim_id: str):
+    """Drop the cached context for a claim (call after its results are saved)"""
+    global _invalidations
+    with _context_lock:
+        _invalidations += 1
+        _context_cache.pop(claim_id, None)
+
+
+def _get_claim_context(db: Session, claim_id: str) -> Optional[Tuple[Claim, List[ValidationIssue]]]:
+    """Get the claim and its validation issues, from cache or the database"""
+    with _context_lock:
+        context = _context_cache.get(claim_id)
+        generation = _invalidations
+
+    if context is not None:
+        return context
 
     # Fetch claim from database
     db_claim = db.query(db_models.Claim).filter(
-        db_models.Claim.claim_id == request.claim_id
+        db_models.Claim.claim_id == claim_id
     ).first()
 
     if not db_claim:
-        raise HTTPException(status_code=404, detail="Claim not found")
+        return None
 
     # Fetch validation issues
     db_issues = db.query(db_models.ValidationResult).filter(
-        db_models.ValidationResult.claim_id == request.claim_id
+        db_models.ValidationResult.claim_id == claim_id
     ).all()
 
     # Reconstruct Claim object
@@ -65,9 +93,29 @@ async def ask_question(request: QuestionRequest, db: Session = Depends(get_db)):
         for issue in db_issues
     ]
 
+    context = (claim, issues)
+
+    # Skip caching if a claim was saved while this one was loading
+    with _context_lock:
+        if generation == _invalidations:
+            _context_cache[claim_id] = context
+
+    return context
+
+
+@router.post("/ask", response_model=QuestionResponse)
+async def ask_question(request: QuestionRequest, db: Session = Depends(get_db)):
+    """Ask a question about a specific claim's validation results"""
+
+    context = _get_claim_context(db, request.claim_id)
+
+    if context is None:
+        raise HTTPException(status_code=404, detail="Claim not found")
+
+    claim, issues = context
+
     # Get answer from LLM
-    llm_service = LLMService()
-    answer = llm_service.answer_question(request.question, claim, issues)
+    answer = _llm().answer_question(request.question, claim, issues)
 
     return QuestionResponse(
         claim_id=request.claim_id,
@@ -1,28 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
+import asyncio
+import orjson
 
 from app.models.claim import Claim
 from app.models.validation import ValidationResult
-from app.database.connection import get_db
+from app.database.connection import get_db, SessionLocal
 from app.database import models as db_models
 from app.agents.orchestrator import ClaimValidationOrchestrator
-from app.services.llm_service import LLMService
+from app.api.chat import invalidate_claim_context
+from app.config import settings
 
 router = APIRouter(prefix="/api/claims", tags=["claims"])
 
+# Scalar claim columns used by list views and summary lookups
+_CLAIM_SUMMARY_COLUMNS = (
+    db_models.Claim.claim_id,
+    db_models.Claim.service_date,
+    db_models.Claim.total_charge,
+    db_models.Claim.validation_status,
+    db_models.Claim.created_at
+)
+
+
+def get_orchestrator(request: Request) -> ClaimValidationOrchestrator:
+    """Dependency returning the shared orchestrator built at startup"""
+    return request.app.state.orchestrator
+
 
 @router.post("/validate", response_model=ValidationResult)
-async def validate_claim(claim: Claim, db: Session = Depends(get_db)):
+async def validate_claim(
+    claim: Claim,
+    db: Session = Depends(get_db),
+    orchestrator: ClaimValidationOrchestrator = Depends(get_orchestrator)
+):
     """Validate a single medical claim"""
 
-    llm_service = LLMService()
-    orchestrator = ClaimValidationOrchestrator(db, llm_service)
-
     try:
         # Run validation
-        result = orchestrator.validate_claim(claim)
+        result = orchestrator.validate_claim(claim, db)
 
         # Save to database
         _save_claim_to_db(db, claim, result)
@@ -34,48 +54,85 @@ async def validate_claim(claim: Claim, db: Session = Depends(get_db)):
 
 
 @router.post("/batch-validate")
-async def batch_validate_claims(claims: List[Claim], db: Session = Depends(get_db)):
-    """Validate multiple claims in batch"""
+async def batch_validate_claims(
+    claims: List[Claim],
+    orchestrator: ClaimValidationOrchestrator = Depends(get_orchestrator)
+):
+    """Validate multiple claims in batch, streaming one NDJSON line per claim as it completes
 
-    llm_service = LLMService()
-    orchestrator = ClaimValidationOrchestrator(db, llm_service)
+    The final line summarizes the batch: {"total", "successful", "failed"}.
+    """
 
-    results = []
-    failed = []
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
 
-    for claim in claims:
+    def _validate_and_save(claim: Claim) -> ValidationResult:
+        # Sessions aren't thread-safe, so each worker validates and saves through its own
+        worker_db = SessionLocal()
         try:
-            result = orchestrator.validate_claim(claim)
-            _save_claim_to_db(db, claim, result)
-            results.append({
-                "claim_id": claim.claim_id,
-                "status": "success",
-                "result": result
-            })
-        except Exception as e:
-            failed.append({
-                "claim_id": claim.claim_id,
-                "status": "failed",
-                "error": str(e)
-            })
+            result = orchestrator.validate_claim(claim, worker_db)
+            _save_claim_to_db(worker_db, claim, result)
+        finally:
+            worker_db.close()
+        return result
 
-    return {
-        "total": len(claims),
-        "successful": len(results),
-        "failed": len(failed),
-        "results": results,
-        "errors": failed
-    }
+    async def _run(claim: Claim) -> dict:
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(_validate_and_save, claim)
+            except Exception as e:
+                return {
+                    "claim_id": claim.claim_id,
+                    "status": "failed",
+                    "error": str(e)
+                }
+
+        return {
+            "claim_id": claim.claim_id,
+            "status": "success",
+            "result": result.model_dump(mode='json')
+        }
+
+    async def _run_group(group: List[Claim]) -> List[dict]:
+        # Copies of one claim_id upsert the same row, so they run one after another in batch order
+        return [await _run(claim) for claim in group]
+
+    # Group resubmitted claims by claim_id, keeping first-seen order
+    groups = {}
+    for claim in claims:
+        groups.setdefault(claim.claim_id, []).append(claim)
+
+    async def _stream():
+        successful = 0
+
+        # Validate claims concurrently (bounded by batch_concurrency), emitting each group as it finishes
+        for next_outcomes in asyncio.as_completed([_run_group(group) for group in groups.values()]):
+            for outcome in await next_outcomes:
+                if outcome["status"] == "success":
+                    successful += 1
+                yield orjson.dumps(outcome) + b"\n"
+
+        yield orjson.dumps({
+            "total": len(claims),
+            "successful": successful,
+            "failed": len(claims) - successful
+        }) + b"\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
 
 
 @router.get("/{claim_id}", response_model=dict)
-async def get_claim(claim_id: str, db: Session = Depends(get_db)):
-    """Get claim and validation results by ID"""
+async def get_claim(claim_id: str, summary: bool = False, db: Session = Depends(get_db)):
+    """Get claim and validation results by ID (summary=true omits patient, provider and code details)"""
 
     # Get claim from database
-    db_claim = db.query(db_models.Claim).filter(
-        db_models.Claim.claim_id == claim_id
-    ).first()
+    if summary:
+        db_claim = db.execute(
+            select(*_CLAIM_SUMMARY_COLUMNS).where(db_models.Claim.claim_id == claim_id)
+        ).first()
+    else:
+        db_claim = db.query(db_models.Claim).filter(
+            db_models.Claim.claim_id == claim_id
+        ).first()
 
     if not db_claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -85,8 +142,10 @@ async def get_claim(claim_id: str, db: Session = Depends(get_db)):
         db_models.ValidationResult.claim_id == claim_id
     ).all()
 
-    return {
-        "claim": {
+    if summary:
+        claim_data = _claim_summary(db_claim)
+    else:
+        claim_data = {
             "claim_id": db_claim.claim_id,
             "patient": db_claim.patient_data,
             "provider": db_claim.provider_data,
@@ -96,7 +155,10 @@ async def get_claim(claim_id: str, db: Session = Depends(get_db)):
             "total_charge": db_claim.total_charge,
             "validation_status": db_claim.validation_status,
             "created_at": db_claim.created_at
-        },
+        }
+
+    return {
+        "claim": claim_data,
         "validation_issues": [
             {
                 "agent_name": issue.agent_name,
@@ -120,44 +182,54 @@ async def list_claims(
     status: str = None,
     db: Session = Depends(get_db)
 ):
-    """List all claims with optional filtering"""
+    """List all claims with optional filtering, newest first"""
 
-    query = db.query(db_models.Claim)
+    # Only the summary columns are read, never the JSON blobs
+    query = select(*_CLAIM_SUMMARY_COLUMNS)
+    count_query = select(func.count()).select_from(db_models.Claim)
 
     if status:
-        query = query.filter(db_models.Claim.validation_status == status)
+        query = query.where(db_models.Claim.validation_status == status)
+        count_query = count_query.where(db_models.Claim.validation_status == status)
 
-    total = query.count()
-    claims = query.offset(skip).limit(limit).all()
+    total = db.execute(count_query).scalar()
+    claims = db.execute(
+        query.order_by(db_models.Claim.created_at.desc()).offset(skip).limit(limit)
+    ).all()
 
     return {
         "total": total,
         "skip": skip,
         "limit": limit,
-        "claims": [
-            {
-                "claim_id": c.claim_id,
-                "service_date": c.service_date,
-                "total_charge": c.total_charge,
-                "validation_status": c.validation_status,
-                "created_at": c.created_at
-            }
-            for c in claims
-        ]
+        "claims": [_claim_summary(c) for c in claims]
+    }
+
+
+def _claim_summary(row) -> dict:
+    """Summary fields of a claim row selected with _CLAIM_SUMMARY_COLUMNS"""
+    return {
+        "claim_id": row.claim_id,
+        "service_date": row.service_date,
+        "total_charge": row.total_charge,
+        "validation_status": row.validation_status,
+        "created_at": row.created_at
     }
 
 
 def _save_claim_to_db(db: Session, claim: Claim, result: ValidationResult):
     """Helper to save claim and validation results to database"""
 
+    # Serialize the claim once and take the JSON columns from it
+    claim_data = claim.model_dump(mode='json')
+
     # Save claim
     db_claim = db_models.Claim(
         claim_id=claim.claim_id,
-        patient_data=claim.patient.model_dump(mode='json'),
-        provider_data=claim.provider.model_dump(mode='json'),
+        patient_data=claim_data['patient'],
+        provider_data=claim_data['provider'],
         service_date=claim.service_date,
         diagnosis_codes=claim.diagnosis_codes,
-        procedure_codes=[p.model_dump(mode='json') for p in claim.procedure_codes],
+        procedure_codes=claim_data['procedure_codes'],
         total_charge=claim.total_charge,
         validation_status=result.overall_status
     )
@@ -165,24 +237,33 @@ def _save_claim_to_db(db: Session, claim: Claim, result: ValidationResult):
     # Merge (update if exists, insert if new)
     db.merge(db_claim)
 
+    # Bulk inserts bypass autoflush, so write the claim row before its results reference it
+    db.flush()
+
     # Delete old validation results for this claim
-    db.query(db_models.ValidationResult).filter(
-        db_models.ValidationResult.claim_id == claim.claim_id
-    ).delete()
-
-    # Save validation issues
-    for issue in result.issues:
-        db_issue = db_models.ValidationResult(
-            claim_id=claim.claim_id,
-            agent_name=issue.agent_name,
-            issue_type=issue.issue_type,
-            severity=issue.severity.value,
-            description=issue.description,
-            explanation=issue.explanation,
-            confidence_score=issue.confidence_score,
-            cost_impact=issue.cost_impact,
-            suggested_fix=issue.suggested_fix
-        )
-        db.add(db_issue)
+    db.execute(
+        delete(db_models.ValidationResult)
+        .where(db_models.ValidationResult.claim_id == claim.claim_id)
+    )
 
+    # Save validation issues in a single bulk INSERT
+    db.bulk_insert_mappings(db_models.ValidationResult, [
+        {
+            "claim_id": claim.claim_id,
+            "agent_name": issue.agent_name,
+            "issue_type": issue.issue_type,
+            "severity": issue.severity.value,
+            "description": issue.description,
+            "explanation": issue.explanation,
+            "confidence_score": issue.confidence_score,
+            "cost_impact": issue.cost_impact,
+            "suggested_fix": issue.suggested_fix
+        }
+        for issue in result.issues
+    ])
+
+    # Claim upsert, delete and insert are committed as one transaction
     db.commit()
+
+    # Chat answers must see the new results
+    invalidate_claim_context(claim.claim_id)
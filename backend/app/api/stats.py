@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text
 
 from app.database.connection import get_db
 from app.database import models as db_models
@@ -8,48 +8,60 @@ from app.database import models as db_models
 router = APIRouter(prefix="/api/stats", tags=["statistics"])
 
 
-@router.get("/summary")
-async def get_summary_stats(db: Session = Depends(get_db)):
-    """Get overall validation statistics"""
+# Claim status counts plus issue counts by severity, by type and overall, in one round-trip
+_SUMMARY_SQL = text("""
+    SELECT 'status' AS kind, validation_status AS key, COUNT(*) AS count, NULL AS cost_impact
+    FROM claims
+    GROUP BY validation_status
 
-    # Total claims
-    total_claims = db.query(db_models.Claim).count()
+    UNION ALL
 
-    # Claims by status
-    status_counts = db.query(
-        db_models.Claim.validation_status,
-        func.count(db_models.Claim.claim_id)
-    ).group_by(db_models.Claim.validation_status).all()
+    SELECT
+        CASE
+            WHEN GROUPING(severity) = 0 THEN 'severity'
+            WHEN GROUPING(issue_type) = 0 THEN 'issue_type'
+            ELSE 'total'
+        END,
+        COALESCE(severity, issue_type),
+        COUNT(*),
+        SUM(cost_impact)
+    FROM validation_results
+    GROUP BY GROUPING SETS ((severity), (issue_type), ())
+""")
 
-    status_breakdown = {status: count for status, count in status_counts}
 
-    # Total cost impact
-    total_cost_impact = db.query(
-        func.sum(db_models.ValidationResult.cost_impact)
-    ).scalar() or 0.0
+@router.get("/summary")
+async def get_summary_stats(db: Session = Depends(get_db)):
+    """Get overall validation statistics"""
 
-    # Issues by severity
-    severity_counts = db.query(
-        db_models.ValidationResult.severity,
-        func.count(db_models.ValidationResult.id)
-    ).group_by(db_models.ValidationResult.severity).all()
+    status_breakdown = {}
+    severity_breakdown = {}
+    issue_type_counts = []
+    total_issues = 0
+    total_cost_impact = 0.0
+
+    for kind, key, count, cost_impact in db.execute(_SUMMARY_SQL):
+        if kind == 'status':
+            status_breakdown[key] = count
+        elif kind == 'severity':
+            severity_breakdown[key] = count
+        elif kind == 'issue_type':
+            issue_type_counts.append((key, count))
+        else:
+            total_issues = count
+            total_cost_impact = cost_impact or 0.0
 
-    severity_breakdown = {severity: count for severity, count in severity_counts}
+    # Total claims
+    total_claims = sum(status_breakdown.values())
 
     # Issues by type
-    issue_type_counts = db.query(
-        db_models.ValidationResult.issue_type,
-        func.count(db_models.ValidationResult.id)
-    ).group_by(db_models.ValidationResult.issue_type).all()
-
     top_issue_types = sorted(
-        [(issue_type, count) for issue_type, count in issue_type_counts],
+        issue_type_counts,
         key=lambda x: x[1],
         reverse=True
     )[:10]
 
     # Average issues per claim
-    total_issues = db.query(db_models.ValidationResult).count()
     avg_issues_per_claim = total_issues / total_claims if total_claims > 0 else 0
 
     return {
@@ -1,5 +1,7 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Tuple
+from functools import cached_property, lru_cache
 
 
 class Settings(BaseSettings):
@@ -20,9 +22,23 @@ class Settings(BaseSettings):
     api_port: int = 8000
     cors_origins: str = "http://localhost:3000,http://localhost:3001"
 
+    # Batch Config
+    batch_concurrency: int = Field(8, ge=1)  # Claims validated at once by /batch-validate
+
     class Config:
         env_file = ".env"
         case_sensitive = False
 
+    @cached_property
+    def cors_origins_list(self) -> Tuple[str, ...]:
+        """CORS origins parsed from the comma-separated setting"""
+        return tuple(origin.strip() for origin in self.cors_origins.split(",") if origin.strip())
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings loaded once per process; modules read the `settings` instance below"""
+    return Settings()
+
 
-settings = Settings()
+settings = get_settings()
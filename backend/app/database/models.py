@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, Float, Date, DateTime, Text, ARRAY, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, Text, ARRAY, ForeignKey, Boolean, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -42,15 +43,21 @@ class Claim(Base):
     __tablename__ = "claims"
 
     claim_id = Column(String(50), primary_key=True)
-    patient_data = Column(JSON, nullable=False)
-    provider_data = Column(JSON, nullable=False)
+    patient_data = Column(JSONB, nullable=False)
+    provider_data = Column(JSONB, nullable=False)
     service_date = Column(Date, nullable=False)
     diagnosis_codes = Column(ARRAY(String), nullable=False)
-    procedure_codes = Column(JSON, nullable=False)
+    procedure_codes = Column(JSONB, nullable=False)
     total_charge = Column(Float, nullable=False)
-    validation_status = Column(String(20))
+    validation_status = Column(String(20), index=True)
     created_at = Column(DateTime, default=func.now())
 
+    __table_args__ = (
+        Index('ix_claims_created', created_at),
+        # Daily trend group-by
+        Index('ix_claims_created_date', func.date(created_at)),
+    )
+
 
 class ValidationResult(Base):
     __tablename__ = "validation_results"
@@ -58,11 +65,17 @@ class ValidationResult(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     claim_id = Column(String(50), ForeignKey("claims.claim_id"), nullable=False)
     agent_name = Column(String(100), nullable=False)
-    issue_type = Column(String(50), nullable=False)
-    severity = Column(String(20), nullable=False)
+    issue_type = Column(String(50), nullable=False, index=True)
+    severity = Column(String(20), nullable=False, index=True)
     description = Column(Text, nullable=False)
     explanation = Column(Text)
     confidence_score = Column(Float, nullable=False)
     cost_impact = Column(Float)
     suggested_fix = Column(Text)
     created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # Also serves plain claim_id lookups, so claim_id needs no index of its own
+        Index('ix_vr_claim_severity', claim_id, severity),
+        Index('ix_vr_agent', agent_name),
+    )
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import SQLAlchemyError
+import logging
 from app.config import settings
 from app.api import claims, chat, stats
+from app.agents import reference_cache
+from app.agents.orchestrator import ClaimValidationOrchestrator
+from app.services.llm_service import LLMService
+from app.database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Claims Guardian AI - Medical Claims Validator",
@@ -12,7 +20,7 @@ app = FastAPI(
 # CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins.split(","),
+    allow_origins=settings.cors_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -24,6 +32,23 @@ app.include_router(chat.router)
 app.include_router(stats.router)
 
 
+@app.on_event("startup")
+def create_orchestrator():
+    """Build the validation workflow once; requests pass in their own sessions"""
+    app.state.orchestrator = ClaimValidationOrchestrator(db=None, llm_service=LLMService())
+
+
+@app.on_event("startup")
+def load_reference_data():
+    """Preload CPT, ICD-10 and NCCI reference tables for the validators"""
+    try:
+        with SessionLocal() as db:
+            reference_cache.load_reference_data(db)
+    except SQLAlchemyError:
+        # Tables not created yet (init_database.py) - validators look codes up on demand
+        logger.warning("Reference data not preloaded", exc_info=True)
+
+
 @app.get("/health")
 async def health_check():
     return {
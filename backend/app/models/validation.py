@@ -4,10 +4,17 @@ from enum import Enum
 
 
 class IssueSeverity(str, Enum):
-    LOW = "low"
-    MEDIUM = "medium"
-    HIGH = "high"
-    CRITICAL = "critical"
+    # (value, rank) - rank orders issues most severe first
+    LOW = ("low", 3)
+    MEDIUM = ("medium", 2)
+    HIGH = ("high", 1)
+    CRITICAL = ("critical", 0)
+
+    def __new__(cls, value: str, rank: int):
+        member = str.__new__(cls, value)
+        member._value_ = value
+        member.rank = rank
+        return member
 
 
 class ValidationIssue(BaseModel):
@@ -20,6 +27,34 @@ class ValidationIssue(BaseModel):
     cost_impact: Optional[float] = None
     suggested_fix: Optional[str] = None
 
+    @classmethod
+    def from_agent(
+        cls,
+        agent_name: str,
+        issue_type: str,
+        severity: IssueSeverity,
+        description: str,
+        explanation: str,
+        confidence_score: float,
+        cost_impact: Optional[float] = None,
+        suggested_fix: Optional[str] = None
+    ) -> "ValidationIssue":
+        """Build an issue from values produced by a validation agent.
+
+        Agents always pass correctly typed values, so field validation is
+        skipped (model_construct); use the normal constructor for external input.
+        """
+        return cls.model_construct(
+            agent_name=agent_name,
+            issue_type=issue_type,
+            severity=severity,
+            description=description,
+            explanation=explanation,
+            confidence_score=confidence_score,
+            cost_impact=cost_impact,
+            suggested_fix=suggested_fix
+        )
+
 
 class ValidationResult(BaseModel):
     claim_id: str
@@ -15,6 +15,7 @@ Example: 10 issues per claim
 
 from anthropic import Anthropic
 from typing import List, Optional
+import json
 from app.models.claim import Claim
 from app.models.validation import ValidationIssue
 from app.config import settings
@@ -30,15 +31,57 @@ class LLMService:
 
     def explain_issue(self, issue: ValidationIssue, claim: Claim) -> str:
         """Generate detailed human-readable explanation for a validation issue using prompt caching"""
+        return self.explain_issues_batch([issue], claim)[0]
 
-        if not self.client:
-            return issue.explanation  # Fallback to basic explanation
+    def explain_issues_batch(self, issues: List[ValidationIssue], claim: Claim) -> List[str]:
+        """Generate explanations for several issues of one claim in a single LLM call"""
+
+        if not self.client or not issues:
+            return [issue.explanation for issue in issues]  # Fallback to basic explanations
+
+        issues_text = "\n\n".join(
+            f"""{i}. Issue: {issue.description}
+Issue Type: {issue.issue_type}
+Severity: {issue.severity}"""
+            for i, issue in enumerate(issues, 1)
+        )
+
+        user_query = f"""Explain each of these {len(issues)} validation issues:
+
+{issues_text}
+
+Respond with only a JSON array of {len(issues)} strings, one explanation per issue, in the same order."""
+
+        try:
+            response = self.client.messages.create(
+                model="claude-3-5-haiku-20241022",
+                max_tokens=min(300 * len(issues), 4096),
+                system=self._explanation_context(claim),
+                messages=[{"role": "user", "content": user_query}]
+            )
+            text = response.content[0].text
+            explanations = json.loads(text[text.index("["):text.rindex("]") + 1])
+        except Exception:
+            # Fallback to basic explanations if LLM fails or the reply isn't a JSON array
+            return [issue.explanation for issue in issues]
+
+        if (
+            not isinstance(explanations, list)
+            or len(explanations) != len(issues)
+            or not all(isinstance(e, str) for e in explanations)
+        ):
+            return [issue.explanation for issue in issues]
+
+        return explanations
+
+    def _explanation_context(self, claim: Claim) -> List[dict]:
+        """Cacheable system context shared by all issue explanations for a claim"""
 
         # Calculate patient age
         age = (claim.service_date - claim.patient.dob).days // 365
 
         # Static context (cacheable) - stays same for all issues in this claim
-        system_context = [{
+        return [{
             "type": "text",
             "text": f"""You are a medical billing expert. You will explain validation issues clearly and concisely.
 
@@ -59,25 +102,6 @@ Be concise and actionable.""",
             "cache_control": {"type": "ephemeral"}  # Cache this context for 5 minutes
         }]
 
-        # Dynamic query (not cached) - different for each issue
-        user_query = f"""Explain this validation issue:
-
-Issue: {issue.description}
-Issue Type: {issue.issue_type}
-Severity: {issue.severity}"""
-
-        try:
-            response = self.client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=300,
-                system=system_context,
-                messages=[{"role": "user", "content": user_query}]
-            )
-            return response.content[0].text
-        except Exception as e:
-            # Fallback to basic explanation if LLM fails
-            return issue.explanation
-
     def answer_question(self, question: str, claim: Claim, issues: List[ValidationIssue]) -> str:
         """Answer user questions about claim validation results using prompt caching"""
 
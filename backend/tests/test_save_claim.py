@@ -0,0 +1,154 @@
+"""Tests for saving claims and their validation results"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import ARRAY, create_engine, event, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.api import claims as claims_api
+from app.api.claims import _save_claim_to_db
+from app.database import models as db_models
+from app.models.claim import Claim
+from app.models.validation import ValidationIssue, ValidationResult, IssueSeverity
+
+
+# Store the Postgres-only column types as JSON text so the tables can be created in SQLite
+@compiles(JSONB, "sqlite")
+@compiles(ARRAY, "sqlite")
+def _compile_json_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+def _create_engine(url: str):
+    """SQLite engine with foreign keys enforced and the claim tables created"""
+    engine = create_engine(url)
+
+    @event.listens_for(engine, "connect")
+    def _enforce_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    db_models.Base.metadata.create_all(
+        engine,
+        tables=[db_models.Claim.__table__, db_models.ValidationResult.__table__]
+    )
+    return engine
+
+
+@pytest.fixture
+def sqlite_lists(monkeypatch):
+    # Bind list values (ARRAY columns) as JSON text, for this test only
+    monkeypatch.setitem(sqlite3.adapters, (list, sqlite3.PrepareProtocol), json.dumps)
+
+
+@pytest.fixture
+def db(sqlite_lists):
+    engine = _create_engine("sqlite://")
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def session_factory(tmp_path, sqlite_lists):
+    # A file database gives each batch worker its own connection, like the Postgres pool
+    engine = _create_engine(f"sqlite:///{tmp_path / 'claims.db'}")
+    try:
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+
+
+class _SlowOrchestrator:
+    """Stands in for ClaimValidationOrchestrator, giving the nth copy of a claim n + 1 issues"""
+
+    def __init__(self):
+        self.seen = {}
+
+    def validate_claim(self, claim: Claim, db) -> ValidationResult:
+        copy = self.seen.get(claim.claim_id, 0)
+        self.seen[claim.claim_id] = copy + 1
+        time.sleep(0.05)  # Long enough for concurrent copies to overlap
+        return _result(claim.claim_id, copy + 1)
+
+
+def _claim(claim_id: str) -> Claim:
+    return Claim(
+        claim_id=claim_id,
+        patient={"name": "John Doe", "dob": date(1985, 5, 15), "gender": "M", "insurance_id": "XYZ123456789"},
+        provider={"name": "Dr. Jane Smith", "npi": "1234567890", "specialty": "Family Medicine"},
+        service_date=date(2025, 1, 15),
+        diagnosis_codes=[],
+        procedure_codes=[{"cpt": "99213", "modifiers": [], "units": 1, "charge": 135.00}],
+        total_charge=135.00
+    )
+
+
+def _result(claim_id: str, issue_count: int) -> ValidationResult:
+    issues = [
+        ValidationIssue(
+            agent_name="CPT-ICD Validator",
+            issue_type="missing_diagnosis",
+            severity=IssueSeverity.HIGH,
+            description=f"Issue {i}",
+            explanation="E/M services must have documented diagnosis codes",
+            confidence_score=0.95
+        )
+        for i in range(issue_count)
+    ]
+    return ValidationResult(
+        claim_id=claim_id,
+        overall_status="flagged" if issues else "passed",
+        risk_score=15.0 * issue_count,
+        issues=issues,
+        total_cost_impact=0.0,
+        processing_time_ms=1
+    )
+
+
+def test_save_new_claim_with_issues(db):
+    _save_claim_to_db(db, _claim("CLM001"), _result("CLM001", 2))
+
+    assert db.execute(select(db_models.Claim.validation_status)).scalar_one() == "flagged"
+    saved = db.execute(select(db_models.ValidationResult.description)).scalars().all()
+    assert sorted(saved) == ["Issue 0", "Issue 1"]
+
+
+def test_resave_claim_replaces_issues(db):
+    _save_claim_to_db(db, _claim("CLM001"), _result("CLM001", 2))
+    _save_claim_to_db(db, _claim("CLM001"), _result("CLM001", 1))
+
+    saved = db.execute(select(db_models.ValidationResult.description)).scalars().all()
+    assert saved == ["Issue 0"]
+
+
+def test_batch_validate_resubmitted_claim(session_factory, monkeypatch):
+    monkeypatch.setattr(claims_api, "SessionLocal", session_factory)
+
+    async def _collect():
+        response = await claims_api.batch_validate_claims(
+            [_claim("CLM001"), _claim("CLM002"), _claim("CLM001")],
+            orchestrator=_SlowOrchestrator()
+        )
+        return [json.loads(line) async for line in response.body_iterator]
+
+    *outcomes, summary = asyncio.run(_collect())
+
+    assert summary == {"total": 3, "successful": 3, "failed": 0}
+    assert [o["claim_id"] for o in outcomes].count("CLM001") == 2
+    # The later copy in the batch is saved last
+    with session_factory() as db:
+        saved = db.execute(
+            select(db_models.ValidationResult.description)
+            .where(db_models.ValidationResult.claim_id == "CLM001")
+        ).scalars().all()
+    assert sorted(saved) == ["Issue 0", "Issue 1"]